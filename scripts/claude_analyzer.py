@@ -3,17 +3,97 @@ Claude AI analyzer for Rocketbook notes.
 Extracts insights, tasks, patterns, and generates structured output.
 """
 
+import asyncio
+import base64
+import functools
 import logging
-from typing import Dict, List, Optional
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
 import yaml
-from anthropic import Anthropic
+import anthropic
+from anthropic import Anthropic, AsyncAnthropic
 
 logger = logging.getLogger(__name__)
 
 
+# libyaml's C loader parses 3-10x faster than the pure-Python SafeLoader
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_config(config_path: str) -> Dict:
+    """Load and memoize the analysis configuration.
+
+    The YAML never changes within a process, so repeated analyzer
+    instantiations share one parse.
+    """
+    with open(config_path, 'r') as f:
+        return yaml.load(f, Loader=_YAML_LOADER)
+
+
 class ClaudeAnalyzer:
     """Analyzes notes using Claude AI."""
 
+    # Matches a markdown heading (with optional "1." style numbering) and
+    # captures everything up to the next heading, so the whole response is
+    # split into sections in a single pass
+    _SECTION_RE = re.compile(
+        r'^#{1,6}\s*(?:\d+\.\s*)?([^\n]+?)\s*$\n(.*?)(?=^#{1,6}\s|\Z)',
+        re.M | re.S
+    )
+
+    # Strips '#' markers and optional "1." numbering from a heading line
+    _HEADING_PREFIX_RE = re.compile(r'^#+\s*(?:\d+\.\s*)?')
+
+    # Markdown emphasis markers inside a heading ("## **TASKS**")
+    _EMPHASIS_RE = re.compile(r'[*_]')
+
+    # "1." numbering that only becomes leading once emphasis is stripped
+    # ("## **1. TASKS**")
+    _HEADING_NUM_RE = re.compile(r'^\d+\.\s*')
+
+    # Strips bullet/marker characters from either end of a tag line
+    _TAG_CLEAN_RE = re.compile(r'^[\s\-\*#]+|[\s\-\*#]+$')
+
+    # Collapses runs of whitespace when pruning OCR text
+    _WS_RE = re.compile(r'\s+')
+
+    # Max characters per compiled section (tasks/themes/questions) in the
+    # weekly summary prompt, to stay well inside the context window
+    WEEKLY_SECTION_BUDGET = 60_000
+
+    # Static weekly-summary instructions; sent as a cacheable system prompt
+    WEEKLY_SUMMARY_INSTRUCTIONS = """Please analyze these notes from the past week and provide a comprehensive summary.
+
+**Please provide:**
+
+1. **Task Summary**
+   - Open tasks (uncompleted)
+   - Completed tasks
+   - Long-running tasks (appearing multiple times)
+   - Blocked or unclear tasks
+
+2. **Recurring Patterns**
+   - Topics that appeared multiple times
+   - Habits or behaviors noted
+   - Decision patterns
+
+3. **Top Themes**
+   - Main focus areas this week
+   - Important developments
+
+4. **Open Questions**
+   - Unresolved questions
+   - Areas needing investigation
+
+5. **Recommendations**
+   - Suggested priorities for next week
+   - Tasks that need attention
+   - Patterns to be aware of
+"""
+
     def __init__(self, api_key: str, config_path: str):
         """
         Initialize Claude analyzer.
@@ -23,48 +103,103 @@ class ClaudeAnalyzer:
             config_path: Path to analysis_config.yaml
         """
         self.client = Anthropic(api_key=api_key)
+        self.aclient = AsyncAnthropic(api_key=api_key)
 
-        # Load configuration
-        with open(config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+        # Load configuration (memoized at module scope)
+        self.config = _load_config(config_path)
 
         self.model = self.config['claude']['model']
         self.max_tokens = self.config['claude']['max_tokens']
         self.temperature = self.config['claude']['temperature']
+        self.concurrency = self.config['claude'].get('concurrency', 8)
+
+        # Static instruction block built once; marked for Anthropic prompt
+        # caching so repeated calls only pay full price for the OCR text
+        self.static_instructions = self._build_static_instructions()
+
+        # Optional local response cache for repeated/similar notes
+        self.cache = None
+        cache_config = self.config.get('cache', {})
+        if cache_config.get('enabled', False):
+            from response_cache import ResponseCache
+            db_path = os.path.join(os.path.dirname(config_path), 'response_cache.db')
+            self.cache = ResponseCache(
+                db_path=db_path,
+                similarity_threshold=cache_config.get('similarity_threshold', 0.92)
+            )
 
         logger.info("Claude analyzer initialized")
 
-    def analyze_note(self, text_content: str, filename: str) -> Dict:
+    def analyze_note(self, text_content: str, filename: str, pdf_bytes: bytes = None) -> Dict:
         """
         Analyze a single note and extract insights.
 
         Args:
             text_content: OCR text from Rocketbook scan
             filename: Original filename for reference
+            pdf_bytes: Optional raw PDF; when given, the scan is sent to
+                Claude as a native document block (model-side OCR/layout)
+                instead of relying on locally extracted text
 
         Returns:
             Dictionary containing analysis results
         """
         logger.info(f"Analyzing note: {filename}")
 
-        prompt = self._build_analysis_prompt(text_content)
+        # The response cache is keyed by extracted text, which is just a
+        # placeholder in native-PDF mode - skip it to avoid collisions
+        if self.cache and pdf_bytes is None:
+            cached = self.cache.get(text_content)
+            if cached is not None:
+                logger.info(f"Using cached analysis for: {filename}")
+                return cached
+
+        if pdf_bytes is not None:
+            content = [
+                {
+                    "type": "document",
+                    "source": {
+                        "type": "base64",
+                        "media_type": "application/pdf",
+                        "data": base64.b64encode(pdf_bytes).decode()
+                    }
+                },
+                {
+                    "type": "text",
+                    "text": f"**Filename:** {filename}\n\nAnalyze the attached Rocketbook scan."
+                }
+            ]
+        else:
+            content = self._build_user_message(text_content, filename)
 
         try:
             response = self.client.messages.create(
                 model=self.model,
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
+                system=[{
+                    "type": "text",
+                    "text": self.static_instructions,
+                    "cache_control": {"type": "ephemeral"}
+                }],
                 messages=[{
                     "role": "user",
-                    "content": prompt
+                    "content": content
                 }]
             )
 
             analysis_text = response.content[0].text
+            cache_read = getattr(response.usage, 'cache_read_input_tokens', None)
+            if cache_read is not None:
+                logger.debug(f"Prompt cache read tokens: {cache_read}")
             logger.info("Analysis completed successfully")
 
             # Parse the response into structured format
             analysis = self._parse_analysis(analysis_text, text_content)
+
+            if self.cache and pdf_bytes is None:
+                self.cache.put(text_content, analysis)
+
             return analysis
 
         except Exception as e:
@@ -74,20 +209,252 @@ class ClaudeAnalyzer:
                 "raw_text": text_content
             }
 
-    def _build_analysis_prompt(self, text_content: str) -> str:
-        """Build the prompt for Claude based on configuration."""
+    def analyze_note_stream(self, text_content: str, filename: str):
+        """
+        Analyze a note with a streaming response, yielding sections as they
+        complete.
 
-        patterns_config = self.config.get('patterns', {})
-        insights_config = self.config.get('insights', {})
-        tagging_config = self.config.get('tagging', {})
+        Each yielded item is an (UPPERCASED_HEADING, body) tuple, emitted as
+        soon as the next heading arrives in the stream. This lets callers
+        start writing early sections (summary, tasks) to disk while Claude is
+        still generating the rest, instead of waiting for the full response.
+
+        Args:
+            text_content: OCR text from Rocketbook scan
+            filename: Original filename for reference
 
-        prompt = f"""You are analyzing handwritten notes that have been digitized using OCR from a Rocketbook notebook.
-The OCR may contain errors or unclear text. Please analyze the following note and provide structured insights.
+        Yields:
+            (heading, body) tuples in response order
+        """
+        logger.info(f"Analyzing note (streaming): {filename}")
+
+        heading = None
+        body_lines = []
+        buffer = ''
+
+        with self.client.messages.stream(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            system=[{
+                "type": "text",
+                "text": self.static_instructions,
+                "cache_control": {"type": "ephemeral"}
+            }],
+            messages=[{
+                "role": "user",
+                "content": self._build_user_message(text_content, filename)
+            }]
+        ) as stream:
+            for text in stream.text_stream:
+                buffer += text
+                while '\n' in buffer:
+                    line, buffer = buffer.split('\n', 1)
+                    heading, body_lines, section = self._feed_line(line, heading, body_lines)
+                    if section:
+                        yield section
+
+        # Flush whatever trailed after the last newline
+        if buffer:
+            heading, body_lines, section = self._feed_line(buffer, heading, body_lines)
+            if section:
+                yield section
+        if heading is not None:
+            yield heading, '\n'.join(body_lines).strip()
+
+        logger.info("Streaming analysis completed")
+
+    @classmethod
+    def _feed_line(cls, line: str, heading, body_lines):
+        """Advance the incremental section parser by one line.
+
+        Returns the updated (heading, body_lines) state plus the completed
+        (heading, body) tuple if this line closed a section.
+        """
+        stripped = line.lstrip()
+        if stripped.startswith('#'):
+            completed = None
+            if heading is not None:
+                completed = (heading, '\n'.join(body_lines).strip())
+            new_heading = cls._normalize_heading(cls._HEADING_PREFIX_RE.sub('', stripped))
+            return new_heading, [], completed
+        if heading is not None:
+            body_lines.append(line)
+        return heading, body_lines, None
+
+    @classmethod
+    def _normalize_heading(cls, heading: str) -> str:
+        """Reduce a heading to its section lookup key.
+
+        Claude decorates headings inconsistently - "## 1. **TASKS & ACTION
+        ITEMS**" is common even when the prompt shows plain headings - so
+        emphasis markers and numbering are stripped before matching.
+        """
+        heading = cls._EMPHASIS_RE.sub('', heading)
+        heading = cls._HEADING_NUM_RE.sub('', heading)
+        return heading.strip().upper()
+
+    async def analyze_notes_batch(self, items: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        Analyze multiple notes concurrently.
+
+        Requests overlap up to `claude.concurrency` in-flight calls, so total
+        latency is roughly ceil(N / concurrency) round-trips instead of N.
+        Callers drive this with `asyncio.run(analyzer.analyze_notes_batch(items))`.
+
+        Args:
+            items: List of (text_content, filename) tuples
+
+        Returns:
+            List of analysis dictionaries, in the same order as items
+        """
+        logger.info(f"Analyzing batch of {len(items)} notes (concurrency={self.concurrency})")
+
+        sem = asyncio.Semaphore(self.concurrency)
+        tasks = [
+            self._analyze_one_async(text_content, filename, sem)
+            for text_content, filename in items
+        ]
+        return list(await asyncio.gather(*tasks))
+
+    async def _analyze_one_async(
+        self, text_content: str, filename: str, sem: asyncio.Semaphore
+    ) -> Dict:
+        """Analyze a single note through the async client, with backoff on 429."""
+        async with sem:
+            logger.info(f"Analyzing note: {filename}")
+
+            for attempt in range(5):
+                try:
+                    response = await self.aclient.messages.create(
+                        model=self.model,
+                        max_tokens=self.max_tokens,
+                        temperature=self.temperature,
+                        system=[{
+                            "type": "text",
+                            "text": self.static_instructions,
+                            "cache_control": {"type": "ephemeral"}
+                        }],
+                        messages=[{
+                            "role": "user",
+                            "content": self._build_user_message(text_content, filename)
+                        }]
+                    )
+                    return self._parse_analysis(response.content[0].text, text_content)
+
+                except anthropic.RateLimitError as e:
+                    # retry-after may be a float or an HTTP-date; anything
+                    # we can't parse degrades to plain exponential backoff
+                    retry_after = e.response.headers.get('retry-after')
+                    try:
+                        server_delay = int(float(retry_after)) if retry_after else 1
+                    except ValueError:
+                        server_delay = 1
+                    delay = max(min(2 ** attempt, 60), server_delay)
+                    logger.warning(
+                        f"Rate limited analyzing {filename}, "
+                        f"retrying in {delay}s (attempt {attempt + 1}/5)"
+                    )
+                    await asyncio.sleep(delay)
+
+                except Exception as e:
+                    logger.error(f"Error during Claude analysis of {filename}: {e}")
+                    return {
+                        "error": str(e),
+                        "raw_text": text_content
+                    }
+
+            logger.error(f"Rate limit retries exhausted for {filename}")
+            return {
+                "error": "rate limit retries exhausted",
+                "raw_text": text_content
+            }
+
+    def analyze_notes_batched(self, items: List[Tuple[str, str]], interactive: bool = False) -> List[Dict]:
+        """
+        Analyze multiple notes through the Anthropic Message Batches API.
 
-**Original OCR Text:**
-```
-{text_content}
-```
+        Batch jobs run on spare capacity at half the token cost and are not
+        subject to per-minute rate limits, at the price of up to 24h latency.
+        Intended for non-interactive runs (weekly summaries, backlog
+        re-analysis). Falls back to direct calls when `interactive=True` or
+        `claude.use_batch_api` is disabled in config.
+
+        Args:
+            items: List of (text_content, filename) tuples
+            interactive: If True, bypass the Batch API and call synchronously
+
+        Returns:
+            List of analysis dictionaries, in the same order as items
+        """
+        if interactive or not self.config['claude'].get('use_batch_api', False):
+            return [self.analyze_note(text, name) for text, name in items]
+
+        logger.info(f"Submitting batch of {len(items)} notes to Message Batches API")
+
+        requests = [
+            {
+                "custom_id": f"note-{i}",
+                "params": {
+                    "model": self.model,
+                    "max_tokens": self.max_tokens,
+                    "temperature": self.temperature,
+                    "system": [{
+                        "type": "text",
+                        "text": self.static_instructions,
+                        "cache_control": {"type": "ephemeral"}
+                    }],
+                    "messages": [{
+                        "role": "user",
+                        "content": self._build_user_message(text_content, filename)
+                    }]
+                }
+            }
+            for i, (text_content, filename) in enumerate(items)
+        ]
+
+        try:
+            batch = self.client.messages.batches.create(requests=requests)
+            logger.info(f"Batch {batch.id} submitted, polling for completion...")
+
+            while batch.processing_status != 'ended':
+                time.sleep(30)
+                batch = self.client.messages.batches.retrieve(batch.id)
+                logger.debug(f"Batch {batch.id} status: {batch.processing_status}")
+
+            # Stream results and map back to input order via custom_id
+            analyses = {}
+            for entry in self.client.messages.batches.results(batch.id):
+                index = int(entry.custom_id.split('-')[1])
+                text_content, filename = items[index]
+
+                if entry.result.type == 'succeeded':
+                    analysis_text = entry.result.message.content[0].text
+                    analyses[index] = self._parse_analysis(analysis_text, text_content)
+                else:
+                    logger.error(f"Batch entry for {filename} failed: {entry.result.type}")
+                    analyses[index] = {
+                        "error": f"batch request {entry.result.type}",
+                        "raw_text": text_content
+                    }
+
+            logger.info(f"Batch {batch.id} complete")
+            return [analyses[i] for i in range(len(items))]
+
+        except Exception as e:
+            logger.error(f"Error during batch analysis: {e}")
+            return [{"error": str(e), "raw_text": text} for text, _ in items]
+
+    def _build_static_instructions(self) -> str:
+        """Build the static instruction block for Claude based on configuration.
+
+        Everything here is independent of the note being analyzed, so it is
+        built once and sent as a cacheable system prompt.
+        """
+        tagging_config = self.config.get('tagging', {})
+
+        instructions = f"""You are analyzing handwritten notes that have been digitized using OCR from a Rocketbook notebook.
+The OCR may contain errors or unclear text. Please analyze each note you receive and provide structured insights.
 
 **Please provide the following analysis:**
 
@@ -131,7 +498,44 @@ Provide a concise 2-3 sentence summary of the note's main content.
 Use clear section headers and bullet points.
 """
 
-        return prompt
+        return instructions
+
+    def _build_user_message(self, text_content: str, filename: str = '') -> str:
+        """Build the small per-note user message: filename plus OCR text.
+
+        The OCR text is pruned of garbled/duplicate lines first, so Claude
+        only pays input tokens for content that carries signal. The full
+        original text is still kept locally in the analysis result.
+        """
+        prefix = f"**Filename:** {filename}\n\n" if filename else ""
+        return f"{prefix}**Original OCR Text:**\n```\n{self._prune_ocr(text_content)}\n```"
+
+    def _prune_ocr(self, text: str) -> str:
+        """Filter OCR noise: garbled lines, whitespace runs, duplicate lines."""
+        pruned = []
+        previous = None
+
+        for line in text.splitlines():
+            collapsed = self._WS_RE.sub(' ', line).strip()
+
+            # Lines with almost no letters are OCR garbage, not content
+            if sum(c.isalpha() for c in collapsed) < 3:
+                continue
+
+            # Drop adjacent duplicates (common OCR artifact on ruled pages)
+            if collapsed == previous:
+                continue
+
+            pruned.append(collapsed)
+            previous = collapsed
+
+        result = '\n'.join(pruned)
+        if not result:
+            return text
+
+        if len(result) < len(text):
+            logger.debug(f"Pruned OCR text from {len(text)} to {len(result)} characters")
+        return result
 
     def _parse_analysis(self, analysis_text: str, original_text: str) -> Dict:
         """
@@ -144,52 +548,33 @@ Use clear section headers and bullet points.
         Returns:
             Structured analysis dictionary
         """
-        # Extract sections from markdown response
+        # Split the markdown response into sections in a single pass
+        sections = {
+            self._normalize_heading(match.group(1)): match.group(2).strip()
+            for match in self._SECTION_RE.finditer(analysis_text)
+        }
+
         result = {
             "full_analysis": analysis_text,
             "original_text": original_text,
-            "tasks": self._extract_section(analysis_text, "TASKS & ACTION ITEMS"),
-            "themes": self._extract_section(analysis_text, "KEY THEMES & TOPICS"),
-            "questions": self._extract_section(analysis_text, "QUESTIONS & UNCERTAINTIES"),
-            "insights": self._extract_section(analysis_text, "INSIGHTS & OBSERVATIONS"),
-            "tags": self._extract_tags(analysis_text),
-            "summary": self._extract_section(analysis_text, "SUMMARY"),
-            "metadata": self._extract_section(analysis_text, "METADATA"),
+            "tasks": sections.get("TASKS & ACTION ITEMS", ""),
+            "themes": sections.get("KEY THEMES & TOPICS", ""),
+            "questions": sections.get("QUESTIONS & UNCERTAINTIES", ""),
+            "insights": sections.get("INSIGHTS & OBSERVATIONS", ""),
+            "tags": self._extract_tags(sections.get("SUGGESTED TAGS", "")),
+            "summary": sections.get("SUMMARY", ""),
+            "metadata": sections.get("METADATA", ""),
         }
 
         return result
 
-    def _extract_section(self, text: str, section_name: str) -> str:
-        """Extract a specific section from the analysis text."""
-        lines = text.split('\n')
-        section_lines = []
-        in_section = False
-
-        for line in lines:
-            # Check if we're entering the section
-            if section_name.upper() in line.upper() and line.strip().startswith('#'):
-                in_section = True
-                continue
-
-            # Check if we're entering a new section
-            if in_section and line.strip().startswith('#'):
-                break
-
-            # Collect lines in the section
-            if in_section and line.strip():
-                section_lines.append(line)
-
-        return '\n'.join(section_lines).strip()
-
-    def _extract_tags(self, text: str) -> List[str]:
-        """Extract tags from the analysis."""
-        tags_section = self._extract_section(text, "SUGGESTED TAGS")
-
+    def _extract_tags(self, tags_section: str) -> List[str]:
+        """Extract tags from the pre-parsed SUGGESTED TAGS section."""
         # Simple extraction - look for hashtags or words after bullets
         tags = []
         for line in tags_section.split('\n'):
             # Remove bullets and common punctuation
-            cleaned = line.strip('- *#').strip()
+            cleaned = self._TAG_CLEAN_RE.sub('', line)
             if cleaned and len(cleaned) < 30:  # Reasonable tag length
                 # Split on commas if multiple tags per line
                 for tag in cleaned.split(','):
@@ -227,45 +612,23 @@ Use clear section headers and bullet points.
             if 'questions' in note:
                 all_questions.append(note['questions'])
 
-        prompt = f"""Please analyze these notes from the past week and provide a comprehensive summary.
+        # Join each section once and keep the prompt inside a fixed budget
+        # rather than blindly growing with the week's note count
+        joined_tasks = self._join_capped(all_tasks, self.WEEKLY_SECTION_BUDGET)
+        joined_themes = self._join_capped(all_themes, self.WEEKLY_SECTION_BUDGET)
+        joined_questions = self._join_capped(all_questions, self.WEEKLY_SECTION_BUDGET)
 
-**Notes Summary:**
+        prompt = f"""**Notes Summary:**
 Total notes analyzed: {len(notes_data)}
 
 **All Tasks Identified:**
-{chr(10).join(all_tasks)}
+{joined_tasks}
 
 **All Themes:**
-{chr(10).join(all_themes)}
+{joined_themes}
 
 **All Questions:**
-{chr(10).join(all_questions)}
-
-**Please provide:**
-
-1. **Task Summary**
-   - Open tasks (uncompleted)
-   - Completed tasks
-   - Long-running tasks (appearing multiple times)
-   - Blocked or unclear tasks
-
-2. **Recurring Patterns**
-   - Topics that appeared multiple times
-   - Habits or behaviors noted
-   - Decision patterns
-
-3. **Top Themes**
-   - Main focus areas this week
-   - Important developments
-
-4. **Open Questions**
-   - Unresolved questions
-   - Areas needing investigation
-
-5. **Recommendations**
-   - Suggested priorities for next week
-   - Tasks that need attention
-   - Patterns to be aware of
+{joined_questions}
 """
 
         try:
@@ -273,6 +636,11 @@ Total notes analyzed: {len(notes_data)}
                 model=self.model,
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
+                system=[{
+                    "type": "text",
+                    "text": self.WEEKLY_SUMMARY_INSTRUCTIONS,
+                    "cache_control": {"type": "ephemeral"}
+                }],
                 messages=[{
                     "role": "user",
                     "content": prompt
@@ -284,3 +652,15 @@ Total notes analyzed: {len(notes_data)}
         except Exception as e:
             logger.error(f"Error generating weekly summary: {e}")
             return f"Error generating summary: {e}"
+
+    @staticmethod
+    def _join_capped(parts: List[str], budget: int) -> str:
+        """Join parts with newlines, truncating once the budget is reached."""
+        joined = '\n'.join(parts)
+        if len(joined) > budget:
+            logger.warning(
+                f"Weekly summary section truncated from {len(joined)} "
+                f"to {budget} characters"
+            )
+            joined = joined[:budget] + "\n... [truncated]"
+        return joined
@@ -6,20 +6,32 @@ Handles authentication, file listing, downloading, and deletion.
 import os
 import pickle
 import logging
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Dict, Optional
 
-from google.auth.transport.requests import Request
+import httplib2
+import google_auth_httplib2
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
+from concurrent.futures import ThreadPoolExecutor
 import io
 
 # Google Drive API scopes
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
+# Shared (creds, service) handles keyed by (credentials_path, token_path),
+# so repeated client instantiations skip token load and service rebuild
+_service_cache = {}
+
+# Files at or above this size are downloaded with concurrent range requests
+PARALLEL_DOWNLOAD_THRESHOLD = 4 * 1024 * 1024
+PARALLEL_DOWNLOAD_WORKERS = 8
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,16 +49,26 @@ class GoogleDriveClient:
         self.credentials_path = credentials_path
         self.token_path = token_path
         self.service = None
+
+        # Folder name -> id cache; lookups repeat within a run
+        self._folder_cache = {}
+
+        # One keep-alive HTTP connection per thread: the shared service
+        # handle is safe to build requests from, but each worker needs its
+        # own transport for concurrent execution
+        self._local = threading.local()
+
         self._authenticate()
 
     def _authenticate(self):
         """Authenticate with Google Drive API."""
-        creds = None
+        cache_key = (self.credentials_path, self.token_path)
+        if cache_key in _service_cache:
+            self.creds, self.service = _service_cache[cache_key]
+            logger.debug("Reusing cached Google Drive service")
+            return
 
-        # Load token if it exists
-        if os.path.exists(self.token_path):
-            with open(self.token_path, 'rb') as token:
-                creds = pickle.load(token)
+        creds = self._load_token()
 
         # If no valid credentials, authenticate
         if not creds or not creds.valid:
@@ -60,13 +82,48 @@ class GoogleDriveClient:
                 )
                 creds = flow.run_local_server(port=0)
 
-            # Save credentials
-            with open(self.token_path, 'wb') as token:
-                pickle.dump(creds, token)
+            self._save_token(creds)
 
-        self.service = build('drive', 'v3', credentials=creds)
+        self.creds = creds
+        # cache_discovery=False skips the deprecated file-cache lookup for
+        # the discovery document on every build
+        self.service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        _service_cache[cache_key] = (self.creds, self.service)
         logger.info("Google Drive authentication successful")
 
+    def _thread_http(self):
+        """Authorized keep-alive transport owned by the calling thread."""
+        if not hasattr(self._local, 'http'):
+            self._local.http = google_auth_httplib2.AuthorizedHttp(
+                self.creds, http=httplib2.Http(timeout=30)
+            )
+        return self._local.http
+
+    def _load_token(self) -> Optional[Credentials]:
+        """Load saved credentials, migrating legacy pickle tokens to JSON."""
+        if not os.path.exists(self.token_path):
+            return None
+
+        try:
+            return Credentials.from_authorized_user_file(self.token_path, SCOPES)
+        except ValueError:
+            pass
+
+        # Legacy pickle token: load it once and rewrite as JSON
+        try:
+            with open(self.token_path, 'rb') as token:
+                creds = pickle.load(token)
+            logger.info("Migrating legacy pickle token to JSON")
+            self._save_token(creds)
+            return creds
+        except Exception as e:
+            logger.warning(f"Could not load saved token, re-authenticating: {e}")
+            return None
+
+    def _save_token(self, creds: Credentials):
+        """Persist credentials as JSON (no pickle deserialization risk)."""
+        Path(self.token_path).write_text(creds.to_json())
+
     def find_folder(self, folder_name: str) -> Optional[str]:
         """
         Find folder by name in Google Drive.
@@ -77,6 +134,9 @@ class GoogleDriveClient:
         Returns:
             Folder ID if found, None otherwise
         """
+        if folder_name in self._folder_cache:
+            return self._folder_cache[folder_name]
+
         try:
             query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
             results = self.service.files().list(
@@ -88,6 +148,7 @@ class GoogleDriveClient:
             files = results.get('files', [])
             if files:
                 logger.info(f"Found folder '{folder_name}' with ID: {files[0]['id']}")
+                self._folder_cache[folder_name] = files[0]['id']
                 return files[0]['id']
             else:
                 logger.warning(f"Folder '{folder_name}' not found in Google Drive")
@@ -97,32 +158,52 @@ class GoogleDriveClient:
             logger.error(f"Error finding folder: {e}")
             return None
 
-    def list_files(self, folder_id: str) -> List[Dict]:
+    def list_files(self, folder_id: str, since: Optional[str] = None) -> List[Dict]:
         """
         List all PDF files in a folder.
 
         Args:
             folder_id: Google Drive folder ID
+            since: Optional ISO timestamp; only files modified after this
+                are returned, so steady-state polls fetch just the delta
 
         Returns:
             List of file metadata dicts
+
+        Raises:
+            Exception: If the listing request fails. Callers must be able
+                to tell a failed listing from an empty folder, so this
+                does not swallow errors into an empty list.
         """
         try:
             query = f"'{folder_id}' in parents and mimeType='application/pdf' and trashed=false"
-            results = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id, name, createdTime, modifiedTime, size)',
-                orderBy='createdTime desc'
-            ).execute()
+            if since:
+                query += f" and modifiedTime > '{since}'"
+
+            files = []
+            page_token = None
+
+            while True:
+                results = self.service.files().list(
+                    q=query,
+                    spaces='drive',
+                    fields='nextPageToken, files(id, name, createdTime, modifiedTime, size)',
+                    orderBy='createdTime desc',
+                    pageSize=1000,
+                    pageToken=page_token
+                ).execute()
+
+                files.extend(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
 
-            files = results.get('files', [])
             logger.info(f"Found {len(files)} PDF files in folder")
             return files
 
         except Exception as e:
             logger.error(f"Error listing files: {e}")
-            return []
+            raise
 
     def download_file(self, file_id: str, destination_path: str) -> bool:
         """
@@ -136,10 +217,22 @@ class GoogleDriveClient:
             True if successful, False otherwise
         """
         try:
-            request = self.service.files().get_media(fileId=file_id)
-
             os.makedirs(os.path.dirname(destination_path), exist_ok=True)
 
+            # Large files: concurrent range requests overlap the network
+            # round-trips; small files aren't worth the extra requests
+            size = self._get_file_size(file_id)
+            if size >= PARALLEL_DOWNLOAD_THRESHOLD:
+                try:
+                    self._download_ranged(file_id, destination_path, size)
+                    logger.info(f"Downloaded file to: {destination_path}")
+                    return True
+                except Exception as e:
+                    logger.warning(f"Ranged download failed, falling back to single stream: {e}")
+
+            request = self.service.files().get_media(fileId=file_id)
+            request.http = self._thread_http()
+
             with io.FileIO(destination_path, 'wb') as fh:
                 downloader = MediaIoBaseDownload(fh, request)
                 done = False
@@ -155,6 +248,70 @@ class GoogleDriveClient:
             logger.error(f"Error downloading file: {e}")
             return False
 
+    def download_to_buffer(self, file_id: str) -> Optional[io.BytesIO]:
+        """
+        Download a file into an in-memory buffer.
+
+        Skips the temp-file round-trip for callers that only need the bytes
+        (e.g. PDF text extraction).
+
+        Args:
+            file_id: Google Drive file ID
+
+        Returns:
+            BytesIO positioned at the start, or None on failure
+        """
+        try:
+            request = self.service.files().get_media(fileId=file_id)
+            request.http = self._thread_http()
+            fh = io.BytesIO()
+            downloader = MediaIoBaseDownload(fh, request)
+            done = False
+            while not done:
+                status, done = downloader.next_chunk()
+                if status:
+                    logger.debug(f"Download progress: {int(status.progress() * 100)}%")
+
+            fh.seek(0)
+            logger.info(f"Downloaded file {file_id} to memory ({fh.getbuffer().nbytes} bytes)")
+            return fh
+
+        except Exception as e:
+            logger.error(f"Error downloading file to buffer: {e}")
+            return None
+
+    def _get_file_size(self, file_id: str) -> int:
+        """Look up a file's size in bytes (0 if unknown)."""
+        try:
+            metadata = self.service.files().get(fileId=file_id, fields='size').execute(http=self._thread_http())
+            return int(metadata.get('size', 0))
+        except Exception as e:
+            logger.debug(f"Could not get file size: {e}")
+            return 0
+
+    def _download_ranged(self, file_id: str, destination_path: str, size: int):
+        """Download a file via concurrent HTTP Range requests."""
+        session = AuthorizedSession(self.creds)
+        url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
+        chunk_size = -(-size // PARALLEL_DOWNLOAD_WORKERS)  # ceil division
+
+        def fetch_range(start: int) -> tuple:
+            end = min(start + chunk_size, size) - 1
+            response = session.get(url, headers={'Range': f'bytes={start}-{end}'})
+            if response.status_code != 206:
+                raise IOError(f"Expected 206 Partial Content, got {response.status_code}")
+            return start, response.content
+
+        starts = range(0, size, chunk_size)
+        with ThreadPoolExecutor(max_workers=PARALLEL_DOWNLOAD_WORKERS) as executor:
+            chunks = list(executor.map(fetch_range, starts))
+
+        with open(destination_path, 'wb') as f:
+            f.truncate(size)
+            for start, data in chunks:
+                f.seek(start)
+                f.write(data)
+
     def get_file_text(self, file_id: str) -> Optional[str]:
         """
         Export file as plain text (for Google Docs).
@@ -192,7 +349,7 @@ class GoogleDriveClient:
             True if successful, False otherwise
         """
         try:
-            self.service.files().delete(fileId=file_id).execute()
+            self.service.files().delete(fileId=file_id).execute(http=self._thread_http())
             logger.info(f"Deleted file with ID: {file_id}")
             return True
 
@@ -200,13 +357,14 @@ class GoogleDriveClient:
             logger.error(f"Error deleting file: {e}")
             return False
 
-    def delete_old_files(self, folder_id: str, retention_days: int) -> int:
+    def delete_old_files(self, folder_id: str, retention_days: int, batch_size: int = 100) -> int:
         """
         Delete files older than retention period.
 
         Args:
             folder_id: Google Drive folder ID
             retention_days: Number of days to retain files
+            batch_size: Sub-requests per batched HTTP call (Drive max: 100)
 
         Returns:
             Number of files deleted
@@ -228,17 +386,31 @@ class GoogleDriveClient:
             ).execute()
 
             files = results.get('files', [])
-            deleted_count = 0
-
-            for file in files:
-                if self.delete_file(file['id']):
-                    deleted_count += 1
-                    logger.info(
-                        f"Deleted old file: {file['name']} "
-                        f"(created: {file['createdTime']})"
+            if not files:
+                return 0
+
+            # Batch deletes so up to 100 files share one HTTP round-trip
+            # instead of paying a full request per file
+            names = {f['id']: f"{f['name']} (created: {f['createdTime']})" for f in files}
+            deleted = []
+
+            def on_delete(request_id, response, exception):
+                if exception is not None:
+                    logger.error(f"Error deleting {names[request_id]}: {exception}")
+                else:
+                    deleted.append(request_id)
+                    logger.info(f"Deleted old file: {names[request_id]}")
+
+            for start in range(0, len(files), batch_size):
+                batch = self.service.new_batch_http_request(callback=on_delete)
+                for file in files[start:start + batch_size]:
+                    batch.add(
+                        self.service.files().delete(fileId=file['id']),
+                        request_id=file['id']
                     )
+                batch.execute()
 
-            return deleted_count
+            return len(deleted)
 
         except Exception as e:
             logger.error(f"Error deleting old files: {e}")
@@ -32,6 +32,10 @@ class ObsidianWriter:
 
         self._ensure_directories()
 
+        # Relative Scans -> PDFs prefix never changes; compute it once
+        # instead of walking both paths per note
+        self._pdf_rel_prefix = os.path.relpath(self.pdfs_dir, self.scans_dir)
+
         logger.info(f"Obsidian writer initialized at: {vault_path}")
 
     def _ensure_directories(self):
@@ -72,21 +76,34 @@ class ObsidianWriter:
             note_name, analysis, pdf_dest, timestamp
         )
 
-        # Write to file
-        with open(note_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # Write to a .tmp sibling and rename atomically: a crash mid-write
+        # leaves a recoverable partial instead of a half-written note, and
+        # callers only mark the file processed once the rename lands
+        tmp_path = note_path.with_name(note_path.name + '.tmp')
+        tmp_path.write_bytes(content.encode('utf-8'))
+        os.replace(tmp_path, note_path)
 
         logger.info(f"Created Obsidian note: {note_path}")
         return str(note_path)
 
     def _copy_pdf(self, source: str, destination: Path):
-        """Copy PDF to Obsidian vault."""
+        """Copy PDF to Obsidian vault.
+
+        Uses a hardlink when source and vault share a filesystem (no bytes
+        copied), falling back to a byte copy across devices.
+        """
         import shutil
         try:
-            shutil.copy2(source, destination)
-            logger.debug(f"Copied PDF to: {destination}")
-        except Exception as e:
-            logger.error(f"Error copying PDF: {e}")
+            if destination.exists():
+                destination.unlink()
+            os.link(source, destination)
+            logger.debug(f"Hardlinked PDF to: {destination}")
+        except OSError:
+            try:
+                shutil.copy2(source, destination)
+                logger.debug(f"Copied PDF to: {destination}")
+            except Exception as e:
+                logger.error(f"Error copying PDF: {e}")
 
     def _build_note_content(
         self,
@@ -107,85 +124,42 @@ class ObsidianWriter:
         metadata_section = analysis.get('metadata', '')
         original_text = analysis.get('original_text', '')
 
-        # Build frontmatter
+        # Hoist formatted values so each is computed exactly once
         tag_str = ' '.join([f'#{tag}' for tag in tags])
-
-        # Get relative path to PDF from Scans directory
-        pdf_relative = os.path.relpath(pdf_path, self.scans_dir)
-
-        content = f"""---
-created: {timestamp.strftime("%Y-%m-%d %H:%M:%S")}
-source: rocketbook
-type: handwritten-note
-tags: {tag_str}
----
-
-# Rocketbook Note - {timestamp.strftime("%B %d, %Y")}
-
-## Summary
-
-{summary}
-
-## PDF Scan
-
-![[{pdf_relative}]]
-
----
-
-## Tasks & Action Items
-
-{tasks if tasks else "*No tasks identified*"}
-
----
-
-## Key Themes & Topics
-
-{themes if themes else "*No major themes identified*"}
-
----
-
-## Questions & Open Items
-
-{questions if questions else "*No open questions*"}
-
----
-
-## Insights & Observations
-
-{insights if insights else "*No additional insights*"}
-
----
-
-## Metadata
-
-{metadata_section}
-
----
-
-## Original OCR Text
-
-```
-{original_text}
-```
-
----
-
-## AI Analysis
-
-> This note was automatically processed and analyzed using Claude AI.
-> Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-
-**Tags:** {tag_str}
-
----
-
-## Related Notes
-
-<!-- Links to related notes will appear here as they're created -->
-
-"""
-
-        return content
+        created = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        human_date = timestamp.strftime("%B %d, %Y")
+        generated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # Relative path to PDF from Scans directory, via the cached prefix
+        pdf_relative = f"{self._pdf_rel_prefix}/{pdf_path.name}"
+
+        # Assemble as chunks joined once, rather than one giant f-string
+        # that allocates an intermediate per interpolation
+        parts = [
+            "---\ncreated: ", created,
+            "\nsource: rocketbook\ntype: handwritten-note\ntags: ", tag_str,
+            "\n---\n\n# Rocketbook Note - ", human_date,
+            "\n\n## Summary\n\n", summary,
+            "\n\n## PDF Scan\n\n![[", pdf_relative,
+            "]]\n\n---\n\n## Tasks & Action Items\n\n",
+            tasks if tasks else "*No tasks identified*",
+            "\n\n---\n\n## Key Themes & Topics\n\n",
+            themes if themes else "*No major themes identified*",
+            "\n\n---\n\n## Questions & Open Items\n\n",
+            questions if questions else "*No open questions*",
+            "\n\n---\n\n## Insights & Observations\n\n",
+            insights if insights else "*No additional insights*",
+            "\n\n---\n\n## Metadata\n\n", metadata_section,
+            "\n\n---\n\n## Original OCR Text\n\n```\n", original_text,
+            "\n```\n\n---\n\n## AI Analysis\n\n"
+            "> This note was automatically processed and analyzed using Claude AI.\n"
+            "> Generated on: ", generated,
+            "\n\n**Tags:** ", tag_str,
+            "\n\n---\n\n## Related Notes\n\n"
+            "<!-- Links to related notes will appear here as they're created -->\n\n",
+        ]
+
+        return ''.join(parts)
 
     def write_weekly_summary(self, week_start: datetime, summary_text: str) -> str:
         """
@@ -229,8 +203,7 @@ Week of {week_start.strftime("%B %d, %Y")}
 *Generated automatically from Rocketbook scans*
 """
 
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        summary_path.write_bytes(content.encode('utf-8'))
 
         logger.info(f"Created weekly summary: {summary_path}")
         return str(summary_path)
@@ -244,21 +217,33 @@ Week of {week_start.strftime("%B %d, %Y")}
         """
         tracker_path = self.rocketbook_dir / "Task-Tracker.md"
 
-        # Group tasks by status
-        open_tasks = []
-        completed_tasks = []
-        long_running = []
+        # Single pass: format each task line as it's categorized, avoiding
+        # repeated string concatenation when assembling the file
+        open_lines = []
+        completed_lines = []
+        long_running_lines = []
 
         for task in all_tasks:
             if task.get('status') == 'open':
-                open_tasks.append(task)
+                open_lines.append(
+                    f"- [ ] {task.get('text', '')} *({task.get('source', '')})*\n"
+                )
             elif task.get('status') == 'completed':
-                completed_tasks.append(task)
+                if len(completed_lines) < 10:  # Show last 10 completed
+                    completed_lines.append(
+                        f"- [x] {task.get('text', '')} *({task.get('source', '')})*\n"
+                    )
             if task.get('long_running', False):
-                long_running.append(task)
+                long_running_lines.append(
+                    f"- ⏳ {task.get('text', '')} "
+                    f"*({task.get('first_seen', '')} - {task.get('last_seen', '')})*\n"
+                )
 
-        content = f"""---
-updated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        content = ''.join([
+            f"""---
+updated: {updated}
 type: task-tracker
 tags: #tasks #tracking
 ---
@@ -267,26 +252,17 @@ tags: #tasks #tracking
 
 Auto-updated from handwritten notes.
 
-## Open Tasks ({len(open_tasks)})
-
-"""
-
-        for task in open_tasks:
-            content += f"- [ ] {task.get('text', '')} *({task.get('source', '')})*\n"
-
-        content += f"\n## Long-Running Tasks ({len(long_running)})\n\n"
-
-        for task in long_running:
-            content += f"- ⏳ {task.get('text', '')} *({task.get('first_seen', '')} - {task.get('last_seen', '')})*\n"
-
-        content += f"\n## Recently Completed ({len(completed_tasks[:10])})\n\n"
-
-        for task in completed_tasks[:10]:  # Show last 10 completed
-            content += f"- [x] {task.get('text', '')} *({task.get('source', '')})*\n"
+## Open Tasks ({len(open_lines)})
 
-        content += "\n---\n\n*Last updated: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "*\n"
+""",
+            *open_lines,
+            f"\n## Long-Running Tasks ({len(long_running_lines)})\n\n",
+            *long_running_lines,
+            f"\n## Recently Completed ({len(completed_lines)})\n\n",
+            *completed_lines,
+            f"\n---\n\n*Last updated: {updated}*\n",
+        ])
 
-        with open(tracker_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        tracker_path.write_text(content, encoding='utf-8')
 
         logger.info(f"Updated task tracker: {tracker_path}")
@@ -0,0 +1,152 @@
+"""
+Local response cache for Claude analyses.
+Returns stored analyses for repeated or structurally similar OCR text,
+turning a full API round-trip into a local lookup on a hit.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# orjson serializes analysis dicts several times faster than stdlib json
+# and emits bytes directly; fall back to stdlib when not installed
+try:
+    import orjson
+
+    def _dumps(obj):
+        return orjson.dumps(obj)
+
+    def _loads(data):
+        return orjson.loads(data)
+
+except ImportError:
+    import json
+
+    def _dumps(obj):
+        return json.dumps(obj)
+
+    def _loads(data):
+        return json.loads(data)
+
+# Semantic matching is optional; without sentence-transformers the cache
+# degrades to exact content-hash lookups
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_AVAILABLE = True
+except ImportError:
+    SEMANTIC_AVAILABLE = False
+
+
+class ResponseCache:
+    """Caches Claude analysis results keyed by note content."""
+
+    def __init__(self, db_path: str, similarity_threshold: float = 0.92):
+        """
+        Initialize the response cache.
+
+        Args:
+            db_path: Path to the SQLite cache database
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.similarity_threshold = similarity_threshold
+        # The analyzer calls get/put from worker threads, so share one
+        # connection guarded by a lock (same pattern as processed.db)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key BLOB PRIMARY KEY, "
+            "embedding BLOB, "
+            "analysis TEXT, "
+            "ts REAL)"
+        )
+        self._conn.commit()
+
+        self._model = None
+        if SEMANTIC_AVAILABLE:
+            try:
+                self._model = SentenceTransformer('all-MiniLM-L6-v2')
+                logger.info("Response cache initialized with semantic matching")
+            except Exception as e:
+                logger.warning(f"Could not load embedding model, exact matching only: {e}")
+        else:
+            logger.info("Response cache initialized (exact matching only)")
+
+    def get(self, text_content: str) -> Optional[Dict]:
+        """
+        Look up a cached analysis for this note text.
+
+        Tries an exact content-hash match first, then falls back to
+        nearest-neighbor search over stored embeddings when semantic
+        matching is available.
+
+        Args:
+            text_content: OCR text of the note
+
+        Returns:
+            Cached analysis dict, or None on a miss
+        """
+        key = self._hash(text_content)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT analysis FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row:
+            logger.info("Response cache hit (exact)")
+            return _loads(row[0])
+
+        if self._model is None:
+            return None
+
+        embedding = self._embed(text_content)
+        best_score, best_analysis = 0.0, None
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT embedding, analysis FROM cache WHERE embedding IS NOT NULL"
+            ).fetchall()
+
+        for stored_emb, analysis_json in rows:
+            score = float(np.dot(embedding, np.frombuffer(stored_emb, dtype=np.float32)))
+            if score > best_score:
+                best_score, best_analysis = score, analysis_json
+
+        if best_score >= self.similarity_threshold:
+            logger.info(f"Response cache hit (semantic, similarity={best_score:.3f})")
+            return _loads(best_analysis)
+
+        return None
+
+    def put(self, text_content: str, analysis: Dict):
+        """
+        Store an analysis result for future lookups.
+
+        Args:
+            text_content: OCR text of the note
+            analysis: Analysis dict from ClaudeAnalyzer
+        """
+        key = self._hash(text_content)
+        embedding = self._embed(text_content).tobytes() if self._model else None
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, embedding, analysis, ts) VALUES (?, ?, ?, ?)",
+                (key, embedding, _dumps(analysis), time.time())
+            )
+            self._conn.commit()
+
+    def _hash(self, text_content: str) -> bytes:
+        """Content-hash key for exact lookups."""
+        return hashlib.blake2b(text_content.encode('utf-8'), digest_size=16).digest()
+
+    def _embed(self, text_content: str):
+        """Unit-normalized embedding, so dot product equals cosine similarity."""
+        embedding = self._model.encode(text_content).astype(np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
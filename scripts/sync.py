@@ -7,6 +7,11 @@ Downloads scans from Google Drive, analyzes with Claude, and saves to Obsidian.
 import os
 import sys
 import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
@@ -14,12 +19,8 @@ from dotenv import load_dotenv
 # Add scripts directory to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from google_drive import GoogleDriveClient
-from claude_analyzer import ClaudeAnalyzer
-from obsidian_writer import ObsidianWriter
-
-# Load environment variables
-load_dotenv()
+# Component modules (and their heavy SDK dependencies) are imported
+# lazily in __init__ so cold start and failed-config runs stay fast
 
 # Configuration
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -27,19 +28,36 @@ CONFIG_DIR = PROJECT_ROOT / "config"
 LOGS_DIR = PROJECT_ROOT / "logs"
 TEMP_DIR = PROJECT_ROOT / "temp"
 
+# Load environment variables
+if (PROJECT_ROOT / ".env").exists():
+    load_dotenv(PROJECT_ROOT / ".env")
+
 # Ensure directories exist
 LOGS_DIR.mkdir(exist_ok=True)
 TEMP_DIR.mkdir(exist_ok=True)
 
-# Setup logging
+# Setup logging: worker threads enqueue records non-blockingly; a single
+# listener thread drains the queue into the rotating file + console
 log_file = LOGS_DIR / f"sync_{datetime.now().strftime('%Y%m%d')}.log"
+
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_file_handler = RotatingFileHandler(log_file, maxBytes=10_000_000, backupCount=5)
+_file_handler.setFormatter(_log_formatter)
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(_log_formatter)
+
+_log_queue = queue.Queue(-1)
+log_listener = QueueListener(_log_queue, _file_handler, _stream_handler)
+log_listener.start()
+
+# The QueueHandler must pass the raw message through: QueueHandler.prepare
+# bakes its formatter's output into record.msg, and the listener-side
+# handlers apply the real format. Without this, basicConfig's default
+# format gets applied first and every line comes out double-formatted.
 logging.basicConfig(
     level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO')),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
+    format='%(message)s',
+    handlers=[QueueHandler(_log_queue)]
 )
 
 logger = logging.getLogger(__name__)
@@ -61,6 +79,12 @@ class RocketbookSync:
         # Validate configuration
         self._validate_config()
 
+        # Import here so bad config fails fast without paying for the
+        # Google/Anthropic SDK imports
+        from google_drive import GoogleDriveClient
+        from claude_analyzer import ClaudeAnalyzer
+        from obsidian_writer import ObsidianWriter
+
         # Initialize components
         self.gdrive = GoogleDriveClient(
             credentials_path=str(CONFIG_DIR / "credentials.json"),
@@ -74,9 +98,31 @@ class RocketbookSync:
 
         self.writer = ObsidianWriter(vault_path=self.obsidian_path)
 
-        # Track processed files
-        self.processed_log = CONFIG_DIR / "processed_files.txt"
+        # With claude.send_pdf_document, Claude OCRs the scan itself and
+        # local PyPDF2 extraction is skipped entirely
+        self.native_pdf = self.analyzer.config['claude'].get('send_pdf_document', False)
+
+        # Track processed files in SQLite (WAL mode for cheap, safe commits
+        # from the worker threads)
+        self._processed_db = sqlite3.connect(
+            str(CONFIG_DIR / "processed.db"), check_same_thread=False
+        )
+        self._processed_db.execute("PRAGMA journal_mode=WAL")
+        self._processed_db.execute("PRAGMA synchronous=NORMAL")
+        self._processed_db.execute(
+            "CREATE TABLE IF NOT EXISTS processed (id TEXT PRIMARY KEY)"
+        )
+        self._processed_db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._migrate_processed_log(CONFIG_DIR / "processed_files.txt")
         self.processed_files = self._load_processed_files()
+        self._processed_lock = threading.Lock()
+        self._uncommitted = 0
+
+        # Concurrent file processing (download/Claude/write are all I/O-bound)
+        self.concurrency = int(os.getenv('SYNC_CONCURRENCY', 8))
+        self.download_workers = int(os.getenv('SYNC_DOWNLOAD_WORKERS', 4))
 
         logger.info("Initialization complete")
 
@@ -94,18 +140,63 @@ class RocketbookSync:
                 "Please follow setup instructions in README.md"
             )
 
+    def _migrate_processed_log(self, legacy_log: Path):
+        """Import IDs from the legacy processed_files.txt, if present."""
+        if not legacy_log.exists():
+            return
+
+        # Bulk read + splitlines keeps the line handling in C instead of
+        # iterating the file object line-by-line in Python
+        ids = [(line.strip(),) for line in legacy_log.read_text().splitlines() if line.strip()]
+
+        if ids:
+            self._processed_db.executemany(
+                "INSERT OR IGNORE INTO processed (id) VALUES (?)", ids
+            )
+            self._processed_db.commit()
+            logger.info(f"Migrated {len(ids)} processed file IDs from {legacy_log.name}")
+
+        legacy_log.rename(legacy_log.with_suffix('.txt.bak'))
+
     def _load_processed_files(self) -> set:
-        """Load list of already processed file IDs."""
-        if self.processed_log.exists():
-            with open(self.processed_log, 'r') as f:
-                return set(line.strip() for line in f)
-        return set()
+        """Load set of already processed file IDs."""
+        rows = self._processed_db.execute("SELECT id FROM processed")
+        return {row[0] for row in rows}
 
     def _mark_processed(self, file_id: str):
-        """Mark a file as processed."""
-        self.processed_files.add(file_id)
-        with open(self.processed_log, 'a') as f:
-            f.write(f"{file_id}\n")
+        """Mark a file as processed (thread-safe)."""
+        with self._processed_lock:
+            self.processed_files.add(file_id)
+            self._processed_db.execute(
+                "INSERT OR IGNORE INTO processed (id) VALUES (?)", (file_id,)
+            )
+            # Commit in small groups; _flush_processed picks up the tail
+            self._uncommitted += 1
+            if self._uncommitted >= 20:
+                self._processed_db.commit()
+                self._uncommitted = 0
+
+    def _get_meta(self, key: str):
+        """Read a value from the sync metadata table."""
+        row = self._processed_db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        """Write a value to the sync metadata table."""
+        with self._processed_lock:
+            self._processed_db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+            self._processed_db.commit()
+
+    def _flush_processed(self):
+        """Commit any pending processed-file inserts."""
+        with self._processed_lock:
+            if self._uncommitted:
+                self._processed_db.commit()
+                self._uncommitted = 0
 
     def sync(self):
         """Run the sync process."""
@@ -121,27 +212,65 @@ class RocketbookSync:
                 logger.info("Please create the folder or update GOOGLE_DRIVE_FOLDER_NAME in .env")
                 return
 
-            # Get list of files
-            files = self.gdrive.list_files(folder_id)
+            # Get list of files modified since the last completed sync;
+            # the server returns only the delta instead of the whole folder
+            last_sync = self._get_meta('last_sync')
+            sync_started = datetime.utcnow().isoformat() + 'Z'
+            files = self.gdrive.list_files(folder_id, since=last_sync)
             logger.info(f"Found {len(files)} files in Google Drive")
 
             # Filter to unprocessed files
             new_files = [f for f in files if f['id'] not in self.processed_files]
             logger.info(f"Processing {len(new_files)} new files")
 
-            # Process each file
+            # Two-stage pipeline: a small download pool keeps Drive busy
+            # while the analyze pool (sized to the Claude rate limit) chews
+            # through fetched files, so the slow stage is never starved.
+            # PDF extraction rides along in the fetch stage - it's
+            # milliseconds next to either network hop.
             processed_count = 0
-            for file in new_files:
-                try:
-                    if self._process_file(file):
-                        processed_count += 1
-                        self._mark_processed(file['id'])
-                except Exception as e:
-                    logger.error(f"Error processing {file['name']}: {e}", exc_info=True)
-                    continue
+            with ThreadPoolExecutor(max_workers=self.download_workers) as fetch_pool, \
+                    ThreadPoolExecutor(max_workers=self.concurrency) as analyze_pool:
+
+                fetch_futures = {
+                    fetch_pool.submit(self._fetch_file, f): f for f in new_files
+                }
+
+                analyze_futures = {}
+                for future in as_completed(fetch_futures):
+                    file = fetch_futures[future]
+                    try:
+                        fetched = future.result()
+                    except Exception as e:
+                        logger.error(f"Error fetching {file['name']}: {e}", exc_info=True)
+                        continue
+                    if fetched is None:
+                        continue
+                    buffer, text_content = fetched
+                    analyze_futures[
+                        analyze_pool.submit(self._analyze_and_write, file, buffer, text_content)
+                    ] = file
+
+                for future in as_completed(analyze_futures):
+                    file = analyze_futures[future]
+                    try:
+                        if future.result():
+                            processed_count += 1
+                            self._mark_processed(file['id'])
+                    except Exception as e:
+                        logger.error(f"Error processing {file['name']}: {e}", exc_info=True)
 
             logger.info(f"Successfully processed {processed_count} files")
 
+            # Only advance the incremental-sync watermark when every new
+            # file was processed, so failed files are re-listed on the
+            # next run. A failed listing raises out of sync() above and
+            # never reaches this point - an empty folder and a Drive
+            # error must not look the same here, or files uploaded
+            # before a transient error would be filtered out forever.
+            if processed_count == len(new_files):
+                self._set_meta('last_sync', sync_started)
+
             # Clean up old files from Google Drive
             if self.retention_days > 0:
                 logger.info(f"Cleaning up files older than {self.retention_days} days...")
@@ -154,35 +283,67 @@ class RocketbookSync:
             logger.error(f"Sync failed: {e}", exc_info=True)
             raise
 
-    def _process_file(self, file: dict) -> bool:
+        finally:
+            self._flush_processed()
+
+    def _fetch_file(self, file: dict):
         """
-        Process a single file.
+        Pipeline stage 1: download a file and extract its text.
 
         Args:
             file: File metadata from Google Drive
 
         Returns:
-            True if successful, False otherwise
+            (buffer, text_content) tuple, or None if the download failed
         """
-        logger.info(f"Processing: {file['name']}")
+        logger.info(f"Fetching: {file['name']}")
 
-        # Download file to temp directory
-        temp_pdf = TEMP_DIR / f"{file['id']}.pdf"
-        if not self.gdrive.download_file(file['id'], str(temp_pdf)):
+        # Download into memory; the bytes only touch disk once, for the
+        # vault copy in the analyze stage
+        buffer = self.gdrive.download_to_buffer(file['id'])
+        if buffer is None:
             logger.error(f"Failed to download {file['name']}")
-            return False
+            return None
+
+        # In native-PDF mode the scan goes to Claude as a document block,
+        # so local extraction (which fails on image-only scans anyway)
+        # is pure waste
+        if self.native_pdf:
+            return buffer, f"Rocketbook scan: {file['name']}"
 
         # Extract text from PDF (using basic text extraction for now)
         # In production, you might want to use proper OCR for scanned PDFs
-        text_content = self._extract_text_from_pdf(temp_pdf)
+        text_content = self._extract_text_from_pdf(buffer)
 
         if not text_content:
             logger.warning(f"No text extracted from {file['name']}, using filename")
             text_content = f"Rocketbook scan: {file['name']}\n\nNote: Text extraction failed. Please review the PDF manually."
 
+        return buffer, text_content
+
+    def _analyze_and_write(self, file: dict, buffer, text_content: str) -> bool:
+        """
+        Pipeline stage 2: analyze the note and write it to Obsidian.
+
+        Args:
+            file: File metadata from Google Drive
+            buffer: BytesIO holding the downloaded PDF
+            text_content: Extracted (or placeholder) note text
+
+        Returns:
+            True if successful, False otherwise
+        """
         # Analyze with Claude
-        logger.info("Analyzing note with Claude...")
-        analysis = self.analyzer.analyze_note(text_content, file['name'])
+        logger.info(f"Analyzing note with Claude: {file['name']}")
+        analysis = self.analyzer.analyze_note(
+            text_content,
+            file['name'],
+            pdf_bytes=buffer.getvalue() if self.native_pdf else None
+        )
+
+        # Materialize the PDF only now, for the writer's vault copy
+        temp_pdf = TEMP_DIR / f"{file['id']}.pdf"
+        temp_pdf.write_bytes(buffer.getbuffer())
 
         # Write to Obsidian
         timestamp = datetime.fromisoformat(file['createdTime'].replace('Z', '+00:00'))
@@ -200,13 +361,13 @@ class RocketbookSync:
 
         return True
 
-    def _extract_text_from_pdf(self, pdf_path: Path) -> str:
+    def _extract_text_from_pdf(self, pdf_stream) -> str:
         """
-        Extract text from PDF.
+        Extract text from an in-memory PDF.
         For Rocketbook scans, this may require OCR.
 
         Args:
-            pdf_path: Path to PDF file
+            pdf_stream: Binary file-like object containing the PDF
 
         Returns:
             Extracted text
@@ -215,12 +376,18 @@ class RocketbookSync:
             # Try simple text extraction first
             import PyPDF2
 
-            with open(pdf_path, 'rb') as f:
-                reader = PyPDF2.PdfReader(f)
-                text = ''
-                for page in reader.pages:
-                    text += page.extract_text() + '\n'
+            reader = PyPDF2.PdfReader(pdf_stream)
 
+            # Collect per-page text and join once; one malformed page
+            # shouldn't abort the whole document
+            parts = []
+            for page in reader.pages:
+                try:
+                    parts.append(page.extract_text() or '')
+                except Exception as e:
+                    logger.debug(f"Skipping unreadable page: {e}")
+
+            text = '\n'.join(parts)
             if text.strip():
                 logger.debug("Extracted text using PyPDF2")
                 return text.strip()
@@ -250,6 +417,9 @@ def main():
         logger.error(f"Fatal error: {e}", exc_info=True)
         sys.exit(1)
 
+    finally:
+        log_listener.stop()
+
 
 if __name__ == "__main__":
     main()